@@ -0,0 +1,152 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+MAX_TRACKED_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+
+class RouteLimit:
+    """Budget for one class of routes.
+
+    rate/burst configure the per-client token bucket; max_concurrency caps the
+    requests of this class being handled at once across all clients, and
+    max_wait is the latency target a request may spend queued for a slot.
+    """
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int, max_wait: float):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+
+
+# bcrypt and SQLite writes are serial, so their budgets are much smaller
+ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    "login": RouteLimit(rate=0.5, burst=5, max_concurrency=4, max_wait=1.0),
+    "booking": RouteLimit(rate=1.0, burst=10, max_concurrency=8, max_wait=2.0),
+    "read": RouteLimit(rate=20.0, burst=100, max_concurrency=64, max_wait=2.0),
+}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Return the route class for a request, or None if it is not limited"""
+    if method == "POST" and path in ("/auth/login", "/auth/register"):
+        return "login"
+    if method in ("POST", "PUT", "DELETE") and path.startswith("/api/bookings"):
+        return "booking"
+    if method in ("GET", "HEAD") and path.startswith("/api/"):
+        return "read"
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; return 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken by a request that was shed without being handled"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: RouteLimit):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit.max_concurrency)
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        """Wait up to max_wait for a slot; give up at once if the queue is already too long"""
+        if self.semaphore.locked() and self.waiting >= self.limit.max_concurrency:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.limit.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+
+class AdmissionMiddleware:
+    """Reject requests early with 429/503 and Retry-After instead of queueing them"""
+
+    def __init__(self, app, limits: Dict[str, RouteLimit] = ROUTE_LIMITS):
+        self.app = app
+        self.limits = limits
+        self.limiters = {name: ConcurrencyLimiter(limit) for name, limit in limits.items()}
+        self.buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def bucket_for(self, route_class: str, client: str) -> TokenBucket:
+        key = (route_class, client)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limit = self.limits[route_class]
+            bucket = TokenBucket(limit.rate, limit.burst)
+            self.buckets[key] = bucket
+            if len(self.buckets) > MAX_TRACKED_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        bucket = self.bucket_for(route_class, client)
+        retry_after = bucket.take()
+        if retry_after:
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+
+        limiter = self.limiters[route_class]
+        if not await limiter.acquire():
+            # Server overload should not count against the client's rate
+            bucket.refund()
+            response = JSONResponse(
+                {"detail": "Server busy, try again later"},
+                status_code=503,
+                headers={"Retry-After": str(math.ceil(limiter.limit.max_wait))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, insert, literal
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import Booking, BookingChange
+
+CHANGELOG_RETENTION_DAYS = int(os.getenv("CHANGELOG_RETENTION_DAYS", "7"))
+CHANGELOG_COMPACT_CHUNK_SIZE = int(os.getenv("CHANGELOG_COMPACT_CHUNK_SIZE", "1000"))
+
+
+def record_change(session: AsyncSession, booking_id: int, operation: str):
+    """Add a change entry to the session, committed together with the booking write"""
+    session.add(BookingChange(booking_id=booking_id, operation=operation))
+
+
+async def record_changes(session: AsyncSession, booking_ids: List[int], operation: str):
+    """Set-based variant for bulk writes such as the sweeper"""
+    now = datetime.utcnow()
+    await session.execute(
+        insert(BookingChange).from_select(
+            ["booking_id", "operation", "changed_at"],
+            select(Booking.id, literal(operation), literal(now)).where(Booking.id.in_(booking_ids)),
+        )
+    )
+
+
+async def oldest_seq(session: AsyncSession) -> Optional[int]:
+    result = await session.exec(select(func.min(BookingChange.seq)))
+    return result.one()
+
+
+async def compact(session_factory) -> int:
+    """Delete one chunk of entries past the retention window.
+
+    The newest entry is always kept, so the oldest remaining seq tells clients
+    whether their last sync point was compacted away.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=CHANGELOG_RETENTION_DAYS)
+    async with session_factory() as session:
+        newest = (await session.exec(select(func.max(BookingChange.seq)))).one()
+        if newest is None:
+            return 0
+        stmt = (
+            select(BookingChange.seq)
+            .where(BookingChange.changed_at < cutoff, BookingChange.seq < newest)
+            .order_by(BookingChange.seq)
+            .limit(CHANGELOG_COMPACT_CHUNK_SIZE)
+        )
+        seqs = list((await session.exec(stmt)).all())
+        if not seqs:
+            return 0
+        await session.execute(delete(BookingChange).where(BookingChange.seq.in_(seqs)))
+        await session.commit()
+        return len(seqs)
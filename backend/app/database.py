@@ -1,18 +1,224 @@
-from sqlmodel import SQLModel, create_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
+from app.migrations import SchemaVersionError, check_schema, migrate
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import glob
 import os
+import re
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./dev.db")
 
+# Multi-tenant mode: one database per shop, e.g. sqlite+aiosqlite:///./tenants/{tenant}.db
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL", "")
+TENANT_HEADER = "X-Tenant"
+# Subdomain resolution: acme.barbearia.com.br -> acme
+TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "")
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "64"))
+TENANT_IDLE_SECONDS = int(os.getenv("TENANT_IDLE_SECONDS", "600"))
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
 engine = create_async_engine(DATABASE_URL, echo=False, future=True)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
 
-async def get_session() -> AsyncSession:
-    async with async_session() as session:
+def tenant_database_url(tenant: str) -> str:
+    return TENANT_DATABASE_URL.format(tenant=tenant)
+
+
+def tenant_exists(tenant: str) -> bool:
+    """SQLite tenants are provisioned by creating their file; other backends are assumed to exist"""
+    url = make_url(tenant_database_url(tenant))
+    if not url.drivername.startswith("sqlite"):
+        return True
+    return bool(url.database) and os.path.exists(url.database)
+
+
+def list_tenants() -> List[str]:
+    """Tenants with an existing SQLite file, found by globbing the URL template"""
+    url = make_url(TENANT_DATABASE_URL.replace("{tenant}", "*"))
+    if not url.drivername.startswith("sqlite") or not url.database:
+        return []
+    prefix, suffix = url.database.split("*", 1)
+    tenants = []
+    for path in glob.glob(url.database):
+        tenant = path[len(prefix):len(path) - len(suffix)]
+        if TENANT_ID_PATTERN.match(tenant):
+            tenants.append(tenant)
+    return sorted(tenants)
+
+
+class TenantEngine:
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.engine = create_async_engine(tenant_database_url(tenant), echo=False, future=True)
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.last_used = time.monotonic()
+
+
+class TenantEnginePool:
+    """Bounded, lazily filled pool of per-tenant engines.
+
+    Engines are created on a tenant's first request and evicted least recently
+    used first, either when the pool is full or once idle for too long, so each
+    shop gets its own SQLite file and lock without one process holding open
+    connections for every shop.
+    """
+
+    def __init__(self, max_size: int = TENANT_POOL_SIZE, idle_seconds: int = TENANT_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.entries: "OrderedDict[str, TenantEngine]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def get(self, tenant: str) -> sessionmaker:
+        entry = self.entries.get(tenant)
+        if entry is None:
+            async with self._lock:
+                entry = self.entries.get(tenant)
+                if entry is None:
+                    if not tenant_exists(tenant):
+                        raise HTTPException(status_code=404, detail="Tenant not found")
+                    entry = TenantEngine(tenant)
+                    try:
+                        await check_schema(entry.engine)
+                    except SchemaVersionError:
+                        await entry.engine.dispose()
+                        raise HTTPException(status_code=503, detail="Tenant database not migrated")
+                    self.entries[tenant] = entry
+        self.entries.move_to_end(tenant)
+        entry.last_used = time.monotonic()
+        if self.needs_eviction():
+            async with self._lock:
+                await self.evict()
+        return entry.session_factory
+
+    def needs_eviction(self) -> bool:
+        if len(self.entries) > self.max_size:
+            return True
+        oldest = next(iter(self.entries.values()), None)
+        return oldest is not None and time.monotonic() - oldest.last_used >= self.idle_seconds
+
+    async def evict(self):
+        """Dispose the least recently used engines that are idle or over capacity"""
+        while self.needs_eviction():
+            _, entry = self.entries.popitem(last=False)
+            await entry.engine.dispose()
+
+    def session_factories(self) -> List[Tuple[str, sessionmaker]]:
+        """Snapshot of pooled tenants, without refreshing their idle timers"""
+        return [(tenant, entry.session_factory) for tenant, entry in self.entries.items()]
+
+    async def dispose_all(self):
+        async with self._lock:
+            while self.entries:
+                _, entry = self.entries.popitem(last=False)
+                await entry.engine.dispose()
+
+
+tenant_pool = TenantEnginePool()
+
+
+def multi_tenant() -> bool:
+    return bool(TENANT_DATABASE_URL)
+
+
+def resolve_tenant(request: Request) -> Optional[str]:
+    """Read the tenant from the X-Tenant header or the request subdomain"""
+    tenant = request.headers.get(TENANT_HEADER)
+    if not tenant and TENANT_BASE_DOMAIN:
+        host = request.headers.get("host", "").split(":")[0].lower()
+        suffix = "." + TENANT_BASE_DOMAIN
+        if host.endswith(suffix):
+            tenant = host[: -len(suffix)]
+    if not tenant:
+        return None
+    tenant = tenant.lower()
+    if not TENANT_ID_PATTERN.match(tenant):
+        raise HTTPException(status_code=400, detail="Invalid tenant")
+    return tenant
+
+
+async def session_factory_for(tenant: Optional[str]) -> sessionmaker:
+    if not multi_tenant():
+        return async_session
+    if tenant is None:
+        raise HTTPException(status_code=400, detail="Tenant not specified")
+    return await tenant_pool.get(tenant)
+
+
+def all_session_factories() -> List[Tuple[Optional[str], sessionmaker]]:
+    """Session factories for per-worker jobs such as cache polling: the default database or every pooled tenant"""
+    if not multi_tenant():
+        return [(None, async_session)]
+    return tenant_pool.session_factories()
+
+
+async def background_session_factories() -> AsyncIterator[Tuple[Optional[str], sessionmaker]]:
+    """Session factories for maintenance jobs, covering every tenant rather than only pooled ones.
+
+    Pooled tenants reuse their engine; the others get a short-lived engine that
+    is disposed right after the job, so shops idle past TENANT_IDLE_SECONDS are
+    still swept without entering the request pool. Tenants not yet migrated
+    are skipped.
+    """
+    if not multi_tenant():
+        yield None, async_session
+        return
+    tenants = list_tenants()
+    if not tenants:
+        # Tenant databases can only be listed for SQLite; elsewhere use the pool
+        for tenant, session_factory in tenant_pool.session_factories():
+            yield tenant, session_factory
+        return
+    for tenant in tenants:
+        entry = tenant_pool.entries.get(tenant)
+        if entry is not None:
+            yield tenant, entry.session_factory
+            continue
+        target = TenantEngine(tenant)
+        try:
+            try:
+                await check_schema(target.engine)
+            except SchemaVersionError:
+                continue
+            yield tenant, target.session_factory
+        finally:
+            await target.engine.dispose()
+
+
+async def init_db(tenant: Optional[str] = None) -> Tuple[int, int]:
+    """Create or migrate a database; run at deploy time, not on every startup"""
+    if tenant is None:
+        return await migrate(engine)
+    url = make_url(tenant_database_url(tenant))
+    if url.drivername.startswith("sqlite") and url.database:
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    target = create_async_engine(url, echo=False, future=True)
+    try:
+        return await migrate(target)
+    finally:
+        await target.dispose()
+
+
+async def check_db():
+    """Cheap startup check; tenant databases are checked when their engine is created"""
+    if not multi_tenant():
+        await check_schema(engine)
+
+
+async def get_session(request: Request = None) -> AsyncSession:
+    factory = async_session
+    tenant = None
+    if request is not None and multi_tenant():
+        tenant = resolve_tenant(request)
+        request.state.tenant = tenant
+        factory = await session_factory_for(tenant)
+    async with factory() as session:
+        session.info["tenant"] = tenant
         yield session
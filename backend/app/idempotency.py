@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, delete, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+# How long a retry waits for a request with the same key running in another worker
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_POLL_SECONDS = 0.1
+IDEMPOTENCY_PURGE_CHUNK_SIZE = int(os.getenv("IDEMPOTENCY_PURGE_CHUNK_SIZE", "1000"))
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class Outcome:
+    """Result of the first request for a key: a response value or the error it raised"""
+
+    def __init__(self, fingerprint: str, value: Any = None, error: Optional[BaseException] = None):
+        self.fingerprint = fingerprint
+        self.value = value
+        self.error = error
+        self.expires_at = time.monotonic() + IDEMPOTENCY_TTL_SECONDS
+
+    @classmethod
+    def from_row(cls, row) -> "Outcome":
+        data = json.loads(row.response)
+        if row.status_code is None:
+            return cls(row.fingerprint, value=data)
+        error = HTTPException(status_code=row.status_code, detail=data["detail"], headers=data["headers"])
+        return cls(row.fingerprint, error=error)
+
+    def encode(self) -> Tuple[Optional[int], str]:
+        """Stored form: (status_code, body) for errors, (None, body) for responses"""
+        if self.error is not None:
+            return self.error.status_code, json.dumps({"detail": self.error.detail, "headers": self.error.headers})
+        return None, json.dumps(jsonable_encoder(self.value))
+
+    def unwrap(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def replay(self, response: Response) -> Any:
+        if isinstance(self.error, HTTPException):
+            headers = dict(self.error.headers or {}, **{"Idempotent-Replayed": "true"})
+            raise HTTPException(status_code=self.error.status_code, detail=self.error.detail, headers=headers)
+        response.headers["Idempotent-Replayed"] = "true"
+        return self.unwrap()
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Hash the request parameters so a key reused for a different request is detected"""
+    data = [part.model_dump() if hasattr(part, "model_dump") else part for part in parts]
+    encoded = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def idempotency_scope(request: Request, operation: str, key: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Keys are only unique per tenant and operation"""
+    if key is None:
+        return None
+    if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    tenant = getattr(request.state, "tenant", None) or ""
+    return (tenant, operation, key)
+
+
+def key_filter(key: Tuple[str, ...]):
+    tenant, operation, value = key
+    return and_(
+        IdempotencyKey.tenant == tenant,
+        IdempotencyKey.operation == operation,
+        IdempotencyKey.key == value,
+    )
+
+
+async def load_row(session: AsyncSession, key: Tuple[str, ...]):
+    """Plain columns rather than an entity, so the row stays readable after a rollback"""
+    stmt = select(
+        IdempotencyKey.fingerprint, IdempotencyKey.state, IdempotencyKey.status_code, IdempotencyKey.response
+    ).where(key_filter(key), IdempotencyKey.expires_at > datetime.utcnow())
+    result = await session.exec(stmt)
+    return result.one_or_none()
+
+
+async def claim(session: AsyncSession, key: Tuple[str, ...], fingerprint: str):
+    """Insert the key as in progress inside the caller's transaction.
+
+    The insert takes SQLite's write lock, so a worker claiming the same key
+    blocks until this transaction ends and then fails on the primary key.
+    """
+    tenant, operation, value = key
+    await session.execute(delete(IdempotencyKey).where(key_filter(key), IdempotencyKey.expires_at <= datetime.utcnow()))
+    await session.execute(
+        insert(IdempotencyKey).values(
+            tenant=tenant,
+            operation=operation,
+            key=value,
+            fingerprint=fingerprint,
+            state=IN_PROGRESS,
+            expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        )
+    )
+
+
+async def complete(session: AsyncSession, key: Tuple[str, ...], outcome: Outcome):
+    status_code, body = outcome.encode()
+    await session.execute(
+        update(IdempotencyKey)
+        .where(key_filter(key))
+        .values(state=COMPLETED, status_code=status_code, response=body)
+    )
+
+
+async def purge_expired(session_factory) -> int:
+    """Delete one chunk of expired keys"""
+    async with session_factory() as session:
+        stmt = (
+            select(IdempotencyKey.tenant, IdempotencyKey.operation, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .limit(IDEMPOTENCY_PURGE_CHUNK_SIZE)
+        )
+        keys = [tuple(key) for key in (await session.exec(stmt)).all()]
+        if not keys:
+            return 0
+        columns = tuple_(IdempotencyKey.tenant, IdempotencyKey.operation, IdempotencyKey.key)
+        await session.execute(delete(IdempotencyKey).where(columns.in_(keys)))
+        await session.commit()
+        return len(keys)
+
+
+class IdempotencyStore:
+    """Idempotency keys stored in the database, with an in-process fast path.
+
+    The first request for a key claims it in the same transaction as the
+    booking write, so the key and the booking commit or roll back together
+    and a retry on any worker finds either nothing or the stored response.
+    HTTP errors are stored like responses; unexpected errors roll the claim
+    back so the client can retry. Within one worker, finished outcomes are
+    also kept in a bounded TTL map and concurrent requests with the same key
+    wait on the first one instead of hitting the database.
+    """
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.max_keys = max_keys
+        self.completed: "OrderedDict[Tuple[str, ...], Outcome]" = OrderedDict()
+        self.inflight: Dict[Tuple[str, ...], Tuple[str, asyncio.Future]] = {}
+
+    def purge(self):
+        # Every entry has the same TTL, so insertion order is expiry order
+        now = time.monotonic()
+        while self.completed:
+            outcome = next(iter(self.completed.values()))
+            if outcome.expires_at > now and len(self.completed) <= self.max_keys:
+                break
+            self.completed.popitem(last=False)
+
+    async def run(
+        self,
+        session: AsyncSession,
+        key: Optional[Tuple[str, ...]],
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+        response: Response,
+    ) -> Any:
+        """Run handler and commit its session, or replay the stored outcome for key"""
+        if key is None:
+            value = await handler()
+            await session.commit()
+            return value
+
+        self.purge()
+        outcome = self.completed.get(key)
+        if outcome is None and key in self.inflight:
+            inflight_fingerprint, future = self.inflight[key]
+            if inflight_fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+            outcome = await asyncio.shield(future)
+            if outcome is None:
+                # The first request failed unexpectedly, nothing to replay
+                raise HTTPException(status_code=409, detail="Original request failed, retry")
+
+        if outcome is not None:
+            if outcome.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+            return outcome.replay(response)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = (fingerprint, future)
+        outcome = None
+        try:
+            outcome, replayed = await self.execute(session, key, fingerprint, handler)
+        finally:
+            if outcome is not None:
+                self.completed[key] = outcome
+                self.purge()
+            future.set_result(outcome)
+            del self.inflight[key]
+
+        if outcome.fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+        return outcome.replay(response) if replayed else outcome.unwrap()
+
+    async def execute(
+        self,
+        session: AsyncSession,
+        key: Tuple[str, ...],
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Outcome, bool]:
+        """Return (outcome, replayed) using the database as the source of truth"""
+        row = await load_row(session, key)
+        if row is not None:
+            await session.rollback()
+            if row.state == COMPLETED:
+                return Outcome.from_row(row), True
+            return await self.wait_for(session, key), True
+
+        try:
+            await claim(session, key, fingerprint)
+        except IntegrityError:
+            # Another worker claimed the key first
+            await session.rollback()
+            return await self.wait_for(session, key), True
+
+        try:
+            value = await handler()
+        except HTTPException as exc:
+            await session.rollback()
+            outcome = Outcome(fingerprint, error=exc)
+            try:
+                await claim(session, key, fingerprint)
+                await complete(session, key, outcome)
+                await session.commit()
+            except IntegrityError:
+                # A retry claimed the key meanwhile; it stores its own outcome
+                await session.rollback()
+            return outcome, False
+        except BaseException:
+            await session.rollback()
+            raise
+
+        outcome = Outcome(fingerprint, value=value)
+        await complete(session, key, outcome)
+        await session.commit()
+        return outcome, False
+
+    async def wait_for(self, session: AsyncSession, key: Tuple[str, ...]) -> Outcome:
+        """Poll until the worker holding the key stores its outcome"""
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            row = await load_row(session, key)
+            await session.rollback()
+            if row is None:
+                raise HTTPException(status_code=409, detail="Original request failed, retry")
+            if row.state == COMPLETED:
+                return Outcome.from_row(row)
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+idempotency_store = IdempotencyStore()
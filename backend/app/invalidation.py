@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import all_session_factories
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_POLL_SECONDS = float(os.getenv("INVALIDATION_POLL_SECONDS", "1.0"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_VERSION_PURGE_CHUNK_SIZE = int(os.getenv("CACHE_VERSION_PURGE_CHUNK_SIZE", "1000"))
+
+# Cache namespaces; mutation handlers publish the ones their write makes stale
+SERVICES = "services"
+BARBERS = "barbers"
+AVAILABILITY = "availability"
+
+MISSING = object()
+
+
+class LocalCache:
+    """In-process cache, one bounded LRU per (tenant, namespace).
+
+    Each namespace has a generation that every invalidation bumps. A reader
+    takes the generation before querying the database and passes it to set,
+    which drops the value if an invalidation happened in between, so a read
+    that raced a write cannot cache the pre-write result.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.namespaces: Dict[Tuple[Optional[str], str], "OrderedDict[Any, Any]"] = {}
+        self.generations: Dict[Tuple[Optional[str], str], int] = {}
+
+    def generation(self, tenant: Optional[str], namespace: str) -> int:
+        return self.generations.setdefault((tenant, namespace), 0)
+
+    def get(self, tenant: Optional[str], namespace: str, key: Any) -> Any:
+        entries = self.namespaces.get((tenant, namespace))
+        if entries is None or key not in entries:
+            return MISSING
+        entries.move_to_end(key)
+        return entries[key]
+
+    def set(self, tenant: Optional[str], namespace: str, key: Any, value: Any, generation: int):
+        if self.generation(tenant, namespace) != generation:
+            return
+        entries = self.namespaces.setdefault((tenant, namespace), OrderedDict())
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, tenant: Optional[str], namespace: str, scope: Optional[Tuple] = None):
+        """Drop the namespace, or only keys starting with scope (compared as strings)"""
+        self.generations[(tenant, namespace)] = self.generation(tenant, namespace) + 1
+        if scope is None:
+            self.namespaces.pop((tenant, namespace), None)
+            return
+        entries = self.namespaces.get((tenant, namespace))
+        if not entries:
+            return
+        prefix = tuple(str(part) for part in scope)
+        for key in [key for key in entries if tuple(str(part) for part in key[:len(prefix)]) == prefix]:
+            del entries[key]
+
+    def invalidate_tenant(self, tenant: Optional[str]):
+        for key in [key for key in self.generations if key[0] == tenant]:
+            self.generations[key] += 1
+        for key in [key for key in self.namespaces if key[0] == tenant]:
+            del self.namespaces[key]
+
+
+cache = LocalCache()
+
+
+def version_name(namespace: str, scope: Optional[Tuple] = None) -> str:
+    """cacheversion row name, e.g. availability:2025-12-31:3"""
+    if scope is None:
+        return namespace
+    return ":".join([namespace, *(str(part) for part in scope)])
+
+
+def parse_version_name(name: str) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    namespace, *scope = name.split(":")
+    return namespace, tuple(scope) or None
+
+
+async def publish(session: AsyncSession, *namespaces: str, scope: Optional[Tuple] = None):
+    """Bump the namespaces' versions inside the caller's transaction.
+
+    scope narrows the invalidation to keys starting with it, e.g. one
+    (date, barber_id) for availability. Versions come from one counter per
+    database, taken while the transaction holds SQLite's write lock, so they
+    commit in increasing order and pollers only read rows newer than the
+    last version they saw. Other workers see the new version on their next
+    poll. This worker drops its own entries right after the commit (see
+    below), so it never serves the pre-write value to the next request.
+    """
+    for namespace in namespaces:
+        await session.execute(
+            text(
+                "INSERT INTO cacheversion (name, version) "
+                "VALUES (:name, (SELECT coalesce(max(version), 0) + 1 FROM cacheversion)) "
+                "ON CONFLICT(name) DO UPDATE SET version = excluded.version"
+            ),
+            {"name": version_name(namespace, scope)},
+        )
+    pending = session.sync_session.info.setdefault("invalidate", set())
+    pending.update((namespace, scope) for namespace in namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session: Session):
+    pending = session.info.pop("invalidate", None)
+    if pending:
+        tenant = session.info.get("tenant")
+        for namespace, scope in pending:
+            cache.invalidate(tenant, namespace, scope)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_after_rollback(session: Session):
+    session.info.pop("invalidate", None)
+
+
+async def purge_versions(session_factory) -> int:
+    """Delete one chunk of availability versions for past dates.
+
+    The row holding the newest version is kept so the counter never goes back.
+    """
+    today = date.today().isoformat()
+    async with session_factory() as session:
+        result = await session.execute(
+            text(
+                "SELECT name FROM cacheversion "
+                "WHERE name > :prefix AND name < :cutoff "
+                "AND version < (SELECT max(version) FROM cacheversion) "
+                "LIMIT :limit"
+            ),
+            {
+                "prefix": version_name(AVAILABILITY) + ":",
+                "cutoff": version_name(AVAILABILITY, (today,)),
+                "limit": CACHE_VERSION_PURGE_CHUNK_SIZE,
+            },
+        )
+        names = [name for name, in result.all()]
+        if not names:
+            return 0
+        await session.execute(
+            text("DELETE FROM cacheversion WHERE name IN :names").bindparams(bindparam("names", expanding=True)),
+            {"names": names},
+        )
+        await session.commit()
+        return len(names)
+
+
+class InvalidationPoller:
+    """Polls each database's cacheversion table and drops entries other workers made stale.
+
+    Entries can be stale in this worker for at most INVALIDATION_POLL_SECONDS
+    after another worker's write; booking creation still re-checks the slot
+    against the database, so a stale availability list cannot double-book.
+    """
+
+    def __init__(self, local_cache: LocalCache = cache):
+        self.cache = local_cache
+        self.versions: Dict[Optional[str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll(self):
+        seen = set()
+        for tenant, session_factory in all_session_factories():
+            seen.add(tenant)
+            previous = self.versions.get(tenant)
+            async with session_factory() as session:
+                if previous is None:
+                    result = await session.execute(text("SELECT coalesce(max(version), 0) FROM cacheversion"))
+                    # First poll since the tenant entered the pool: anything cached may be old
+                    self.cache.invalidate_tenant(tenant)
+                    self.versions[tenant] = result.scalar_one()
+                    continue
+                result = await session.execute(
+                    text("SELECT name, version FROM cacheversion WHERE version > :seen ORDER BY version"),
+                    {"seen": previous},
+                )
+                rows = result.all()
+
+            for name, version in rows:
+                namespace, scope = parse_version_name(name)
+                self.cache.invalidate(tenant, namespace, scope)
+                self.versions[tenant] = version
+
+        # Tenants evicted from the engine pool start over when they come back
+        for tenant in [tenant for tenant in self.versions if tenant not in seen]:
+            del self.versions[tenant]
+            self.cache.invalidate_tenant(tenant)
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache invalidation poll failed")
+            await asyncio.sleep(INVALIDATION_POLL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,208 @@
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Versioned schema migrations, applied once at deploy time (see migrate.py).
+# The applied version is kept in SQLite's PRAGMA user_version, so checking it at
+# startup costs a single read. SQLite commits DDL as it runs, so every
+# statement must be safe to re-run if a migration is interrupted halfway.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "baseline schema", [
+        """CREATE TABLE IF NOT EXISTS service (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            duration VARCHAR NOT NULL,
+            price VARCHAR NOT NULL,
+            description VARCHAR,
+            active BOOLEAN NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_service_name ON service (name)",
+        """CREATE TABLE IF NOT EXISTS barber (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            email VARCHAR NOT NULL,
+            password_hash VARCHAR NOT NULL,
+            specialty VARCHAR,
+            active BOOLEAN NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (email)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_barber_name ON barber (name)",
+        """CREATE TABLE IF NOT EXISTS booking (
+            id INTEGER NOT NULL,
+            customer_name VARCHAR NOT NULL,
+            customer_email VARCHAR,
+            customer_phone VARCHAR,
+            service_id INTEGER NOT NULL,
+            barber_id INTEGER NOT NULL,
+            booking_date VARCHAR NOT NULL,
+            booking_time VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(service_id) REFERENCES service (id),
+            FOREIGN KEY(barber_id) REFERENCES barber (id)
+        )""",
+    ]),
+    (2, "customer lookup indexes and full-text search", [
+        "CREATE INDEX IF NOT EXISTS ix_booking_customer_name ON booking (customer_name)",
+        "CREATE INDEX IF NOT EXISTS ix_booking_customer_email ON booking (customer_email)",
+        "CREATE INDEX IF NOT EXISTS ix_booking_customer_phone ON booking (customer_phone)",
+        # Contentless index: rows are found by rowid (= booking.id), so the text is
+        # not stored twice. customer_phone_digits lets "11987654321" match "(11) 98765-4321".
+        """CREATE VIRTUAL TABLE IF NOT EXISTS booking_fts USING fts5(
+            customer_name, customer_email, customer_phone, customer_phone_digits,
+            content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS booking_fts_insert AFTER INSERT ON booking BEGIN
+            INSERT INTO booking_fts (rowid, customer_name, customer_email, customer_phone, customer_phone_digits)
+            VALUES (new.id, new.customer_name, coalesce(new.customer_email, ''), coalesce(new.customer_phone, ''),
+                    replace(replace(replace(replace(replace(coalesce(new.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS booking_fts_delete AFTER DELETE ON booking BEGIN
+            INSERT INTO booking_fts (booking_fts, rowid, customer_name, customer_email, customer_phone, customer_phone_digits)
+            VALUES ('delete', old.id, old.customer_name, coalesce(old.customer_email, ''), coalesce(old.customer_phone, ''),
+                    replace(replace(replace(replace(replace(coalesce(old.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS booking_fts_update
+        AFTER UPDATE OF customer_name, customer_email, customer_phone ON booking BEGIN
+            INSERT INTO booking_fts (booking_fts, rowid, customer_name, customer_email, customer_phone, customer_phone_digits)
+            VALUES ('delete', old.id, old.customer_name, coalesce(old.customer_email, ''), coalesce(old.customer_phone, ''),
+                    replace(replace(replace(replace(replace(coalesce(old.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+            INSERT INTO booking_fts (rowid, customer_name, customer_email, customer_phone, customer_phone_digits)
+            VALUES (new.id, new.customer_name, coalesce(new.customer_email, ''), coalesce(new.customer_phone, ''),
+                    replace(replace(replace(replace(replace(coalesce(new.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        "INSERT INTO booking_fts (booking_fts) VALUES ('delete-all')",
+        """INSERT INTO booking_fts (rowid, customer_name, customer_email, customer_phone, customer_phone_digits)
+        SELECT id, customer_name, coalesce(customer_email, ''), coalesce(customer_phone, ''),
+               replace(replace(replace(replace(replace(coalesce(customer_phone, ''),
+                   ' ', ''), '(', ''), ')', ''), '-', ''), '+', '')
+        FROM booking""",
+    ]),
+    (3, "booking change log", [
+        # AUTOINCREMENT so sequence numbers are never reused after compaction
+        """CREATE TABLE IF NOT EXISTS bookingchange (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL,
+            operation VARCHAR NOT NULL,
+            changed_at DATETIME NOT NULL,
+            FOREIGN KEY(booking_id) REFERENCES booking (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_bookingchange_changed_at ON bookingchange (changed_at)",
+    ]),
+    (4, "cache invalidation versions", [
+        """CREATE TABLE IF NOT EXISTS cacheversion (
+            name VARCHAR NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (name)
+        )""",
+    ]),
+    (5, "partial index for the booking sweeper", [
+        "CREATE INDEX IF NOT EXISTS ix_booking_confirmed ON booking (id) WHERE status = 'confirmed'",
+    ]),
+    (6, "idempotency keys", [
+        """CREATE TABLE IF NOT EXISTS idempotencykey (
+            tenant VARCHAR NOT NULL,
+            operation VARCHAR NOT NULL,
+            "key" VARCHAR NOT NULL,
+            fingerprint VARCHAR NOT NULL,
+            state VARCHAR NOT NULL,
+            status_code INTEGER,
+            response VARCHAR,
+            expires_at DATETIME NOT NULL,
+            PRIMARY KEY (tenant, operation, "key")
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_idempotencykey_expires_at ON idempotencykey (expires_at)",
+    ]),
+    (7, "trigram index for fuzzy customer search", [
+        # Matches any 3-character substring, so typos and infix queries still find
+        # customers when the prefix index returns too few of them
+        """CREATE VIRTUAL TABLE IF NOT EXISTS booking_trigram USING fts5(
+            customer_name, customer_email, customer_phone_digits,
+            content='', tokenize='trigram'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS booking_trigram_insert AFTER INSERT ON booking BEGIN
+            INSERT INTO booking_trigram (rowid, customer_name, customer_email, customer_phone_digits)
+            VALUES (new.id, new.customer_name, coalesce(new.customer_email, ''),
+                    replace(replace(replace(replace(replace(coalesce(new.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS booking_trigram_delete AFTER DELETE ON booking BEGIN
+            INSERT INTO booking_trigram (booking_trigram, rowid, customer_name, customer_email, customer_phone_digits)
+            VALUES ('delete', old.id, old.customer_name, coalesce(old.customer_email, ''),
+                    replace(replace(replace(replace(replace(coalesce(old.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS booking_trigram_update
+        AFTER UPDATE OF customer_name, customer_email, customer_phone ON booking BEGIN
+            INSERT INTO booking_trigram (booking_trigram, rowid, customer_name, customer_email, customer_phone_digits)
+            VALUES ('delete', old.id, old.customer_name, coalesce(old.customer_email, ''),
+                    replace(replace(replace(replace(replace(coalesce(old.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+            INSERT INTO booking_trigram (rowid, customer_name, customer_email, customer_phone_digits)
+            VALUES (new.id, new.customer_name, coalesce(new.customer_email, ''),
+                    replace(replace(replace(replace(replace(coalesce(new.customer_phone, ''),
+                        ' ', ''), '(', ''), ')', ''), '-', ''), '+', ''));
+        END""",
+        "INSERT INTO booking_trigram (booking_trigram) VALUES ('delete-all')",
+        """INSERT INTO booking_trigram (rowid, customer_name, customer_email, customer_phone_digits)
+        SELECT id, customer_name, coalesce(customer_email, ''),
+               replace(replace(replace(replace(replace(coalesce(customer_phone, ''),
+                   ' ', ''), '(', ''), ')', ''), '-', ''), '+', '')
+        FROM booking""",
+    ]),
+    (8, "cache versions from one counter", [
+        # Pollers read only rows newer than the last version they saw
+        "CREATE INDEX IF NOT EXISTS ix_cacheversion_version ON cacheversion (version)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    result = await conn.execute(text("PRAGMA user_version"))
+    return result.scalar_one()
+
+
+async def migrate(engine: AsyncEngine) -> Tuple[int, int]:
+    """Apply pending migrations and return the (old, new) schema versions"""
+    async with engine.begin() as conn:
+        current = await get_schema_version(conn)
+    if current > SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema version {current} is newer than this code ({SCHEMA_VERSION})"
+        )
+
+    for version, _, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        async with engine.begin() as conn:
+            for statement in statements:
+                await conn.execute(text(statement))
+            await conn.execute(text(f"PRAGMA user_version = {version}"))
+    return current, SCHEMA_VERSION
+
+
+async def check_schema(engine: AsyncEngine):
+    """Fail fast if the database was not migrated to this code's schema version"""
+    async with engine.connect() as conn:
+        current = await get_schema_version(conn)
+    if current != SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema version is {current}, expected {SCHEMA_VERSION}. "
+            "Run: python migrate.py"
+        )
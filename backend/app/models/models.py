@@ -29,9 +29,9 @@ class Barber(SQLModel, table=True):
 
 class Booking(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    customer_name: str
-    customer_email: Optional[str] = None
-    customer_phone: Optional[str] = None
+    customer_name: str = Field(index=True)
+    customer_email: Optional[str] = Field(default=None, index=True)
+    customer_phone: Optional[str] = Field(default=None, index=True)
     service_id: int = Field(foreign_key="service.id")
     barber_id: int = Field(foreign_key="barber.id")
     booking_date: str
@@ -42,3 +42,29 @@ class Booking(SQLModel, table=True):
 
     service: Optional[Service] = Relationship(back_populates="bookings")
     barber: Optional[Barber] = Relationship(back_populates="bookings")
+
+
+class BookingChange(SQLModel, table=True):
+    """Append-only log of booking writes, read by clients syncing incrementally"""
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    booking_id: int = Field(foreign_key="booking.id")
+    operation: str
+    changed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class CacheVersion(SQLModel, table=True):
+    """Version per cache namespace or scope, bumped on writes and polled by every worker"""
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0, index=True)
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """Claimed Idempotency-Key with the response to replay, shared by every worker"""
+    tenant: str = Field(primary_key=True)
+    operation: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    fingerprint: str
+    state: str
+    status_code: Optional[int] = None
+    response: Optional[str] = None
+    expires_at: datetime = Field(index=True)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -8,6 +9,7 @@ from datetime import timedelta
 
 from app.database import get_session
 from app.models.models import Barber
+from app.invalidation import publish, BARBERS
 from app.auth import (
     Token,
     verify_password,
@@ -41,11 +43,12 @@ async def register(payload: BarberRegister, session: AsyncSession = Depends(get_
     barber = Barber(
         name=payload.name,
         email=payload.email,
-        password_hash=get_password_hash(payload.password),
+        password_hash=await run_in_threadpool(get_password_hash, payload.password),
         specialty=payload.specialty,
         active=True,
     )
     session.add(barber)
+    await publish(session, BARBERS)
     await session.commit()
     await session.refresh(barber)
 
@@ -60,7 +63,8 @@ async def login(
     result = await session.execute(select(Barber).where(Barber.email == form_data.username))
     barber = result.scalar_one_or_none()
 
-    if not barber or not verify_password(form_data.password, barber.password_hash):
+    # bcrypt is slow on purpose, keep it off the event loop
+    if not barber or not await run_in_threadpool(verify_password, form_data.password, barber.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
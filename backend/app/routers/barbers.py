@@ -5,6 +5,7 @@ from app.database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from app.models.models import Barber
+from app.invalidation import cache, publish, MISSING, BARBERS
 
 router = APIRouter()
 
@@ -20,6 +21,7 @@ async def create_barber(payload: BarberCreate, session: AsyncSession = Depends(g
 
     barber = Barber(**payload.model_dump())
     session.add(barber)
+    await publish(session, BARBERS)
     await session.commit()
     await session.refresh(barber)
     return barber
@@ -27,11 +29,18 @@ async def create_barber(payload: BarberCreate, session: AsyncSession = Depends(g
 @router.get("", response_model=List[BarberRead])
 async def list_barbers(active_only: bool = True, session: AsyncSession = Depends(get_session)):
     """List all barbers, optionally filter by active status"""
+    tenant = session.info.get("tenant")
+    generation = cache.generation(tenant, BARBERS)
+    cached = cache.get(tenant, BARBERS, active_only)
+    if cached is not MISSING:
+        return cached
+
     stmt = select(Barber)
     if active_only:
         stmt = stmt.where(Barber.active == True)
     result = await session.exec(stmt)
-    barbers = result.all()
+    barbers = [BarberRead.model_validate(barber, from_attributes=True) for barber in result.all()]
+    cache.set(tenant, BARBERS, active_only, barbers, generation)
     return barbers
 
 @router.get("/{barber_id}", response_model=BarberRead)
@@ -65,6 +74,7 @@ async def update_barber(barber_id: int, payload: BarberUpdate, session: AsyncSes
         setattr(barber, key, value)
 
     session.add(barber)
+    await publish(session, BARBERS)
     await session.commit()
     await session.refresh(barber)
     return barber
@@ -80,5 +90,6 @@ async def delete_barber(barber_id: int, session: AsyncSession = Depends(get_sess
 
     barber.active = False
     session.add(barber)
+    await publish(session, BARBERS)
     await session.commit()
     return {"status": "deleted"}
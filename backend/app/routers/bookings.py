@@ -1,14 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
-from app.schemas.schemas import BookingCreate, BookingUpdate, BookingRead
+from app.schemas.schemas import BookingCreate, BookingUpdate, BookingRead, BookingChanges
 from app.database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from app.models.models import Booking, Service, Barber
+from sqlalchemy import func
+from app.models.models import Booking, BookingChange, Service, Barber
+from app.changelog import record_change, oldest_seq
+from app.invalidation import cache, publish, MISSING, AVAILABILITY
+from app.idempotency import idempotency_store, idempotency_scope, request_fingerprint, IDEMPOTENCY_HEADER
 from datetime import datetime
 
 router = APIRouter()
 
+# Columns behind each BookingRead field, for sparse fieldsets (?fields=id,booking_time)
+BOOKING_FIELD_COLUMNS = {
+    "id": Booking.id,
+    "customer_name": Booking.customer_name,
+    "customer_email": Booking.customer_email,
+    "customer_phone": Booking.customer_phone,
+    "service_id": Booking.service_id,
+    "service_name": Service.name,
+    "service_duration": Service.duration,
+    "service_price": Service.price,
+    "barber_id": Booking.barber_id,
+    "barber_name": Barber.name,
+    "booking_date": Booking.booking_date,
+    "booking_time": Booking.booking_time,
+    "status": Booking.status,
+    "created_at": Booking.created_at,
+    "updated_at": Booking.updated_at,
+}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split and validate the fields parameter; None means the full BookingRead"""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in BOOKING_FIELD_COLUMNS]
+    if not names or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields: {', '.join(unknown) or fields}. Allowed: {', '.join(BOOKING_FIELD_COLUMNS)}"
+        )
+    return names
+
+def sparse_booking_select(names: List[str]):
+    """Select only the requested columns, joining service/barber only when needed"""
+    stmt = select(*[BOOKING_FIELD_COLUMNS[name].label(name) for name in names]).select_from(Booking)
+    if any(name.startswith("service_") and name != "service_id" for name in names):
+        stmt = stmt.join(Service, Service.id == Booking.service_id)
+    if "barber_name" in names:
+        stmt = stmt.join(Barber, Barber.id == Booking.barber_id)
+    return stmt
+
 def get_duration_minutes(duration: str) -> int:
     """Convert duration string to minutes"""
     if duration == "30min":
@@ -49,8 +96,24 @@ def is_time_slot_available(
     return True
 
 @router.post("", response_model=BookingRead, status_code=201)
-async def create_booking(payload: BookingCreate, session: AsyncSession = Depends(get_session)):
-    """Create a new booking"""
+async def create_booking(
+    payload: BookingCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    session: AsyncSession = Depends(get_session)
+):
+    """Create a new booking, replaying the original response for a repeated Idempotency-Key"""
+    return await idempotency_store.run(
+        session,
+        idempotency_scope(request, "create_booking", idempotency_key),
+        request_fingerprint(payload),
+        lambda: save_new_booking(payload, session),
+        response,
+    )
+
+async def save_new_booking(payload: BookingCreate, session: AsyncSession) -> BookingRead:
+    """Validate and insert a new booking; the idempotency runner commits"""
     # Verify service exists
     stmt_service = select(Service).where(Service.id == payload.service_id, Service.active == True)
     result_service = await session.exec(stmt_service)
@@ -81,8 +144,9 @@ async def create_booking(payload: BookingCreate, session: AsyncSession = Depends
     # Create booking
     booking = Booking(**payload.dict())
     session.add(booking)
-    await session.commit()
-    await session.refresh(booking)
+    await session.flush()
+    record_change(session, booking.id, "create")
+    await publish(session, AVAILABILITY, scope=(booking.booking_date, booking.barber_id))
 
     # Return booking with service and barber details
     return BookingRead(
@@ -108,10 +172,15 @@ async def list_bookings(
     barber_id: Optional[int] = None,
     date: Optional[str] = None,
     status: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    customer_phone: Optional[str] = None,
+    fields: Optional[str] = None,
     session: AsyncSession = Depends(get_session)
 ):
-    """List bookings with optional filters"""
-    stmt = select(Booking)
+    """List bookings with optional filters, optionally only the given comma-separated fields"""
+    names = parse_fields(fields)
+    stmt = select(Booking) if names is None else sparse_booking_select(names)
 
     if barber_id:
         stmt = stmt.where(Booking.barber_id == barber_id)
@@ -119,6 +188,16 @@ async def list_bookings(
         stmt = stmt.where(Booking.booking_date == date)
     if status:
         stmt = stmt.where(Booking.status == status)
+    if customer_name:
+        stmt = stmt.where(Booking.customer_name == customer_name)
+    if customer_email:
+        stmt = stmt.where(Booking.customer_email == customer_email)
+    if customer_phone:
+        stmt = stmt.where(Booking.customer_phone == customer_phone)
+
+    if names is not None:
+        result = await session.execute(stmt)
+        return JSONResponse(jsonable_encoder(result.mappings().all()))
 
     result = await session.exec(stmt)
     bookings = result.all()
@@ -164,6 +243,14 @@ async def get_available_times(
     session: AsyncSession = Depends(get_session)
 ):
     """Get available time slots for a barber on a specific date"""
+    tenant = session.info.get("tenant")
+    # Keyed by (date, barber) first so a booking write invalidates only that day
+    cache_key = (date, barber_id, service_id)
+    generation = cache.generation(tenant, AVAILABILITY)
+    cached = cache.get(tenant, AVAILABILITY, cache_key)
+    if cached is not MISSING:
+        return cached
+
     # Get service to know duration
     stmt_service = select(Service).where(Service.id == service_id)
     result_service = await session.exec(stmt_service)
@@ -199,11 +286,86 @@ async def get_available_times(
             if slot_end <= 19 * 60:  # 19:00 in minutes
                 available_slots.append(slot)
 
-    return {"available_times": available_slots}
+    available = {"available_times": available_slots}
+    cache.set(tenant, AVAILABILITY, cache_key, available, generation)
+    return available
+
+@router.get("/changes", response_model=BookingChanges)
+async def list_booking_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session)
+):
+    """Bookings changed after the given sequence number, for incremental sync.
+
+    Pass next_since back on the following call. reset=true means the log was
+    compacted past `since` and the client must reload the full list instead.
+    """
+    oldest = await oldest_seq(session)
+    if oldest is not None and since < oldest - 1:
+        result_latest = await session.exec(select(func.max(BookingChange.seq)))
+        return BookingChanges(changes=[], next_since=result_latest.one(), has_more=False, reset=True)
+
+    stmt = (
+        select(BookingChange.seq, BookingChange.booking_id)
+        .where(BookingChange.seq > since)
+        .order_by(BookingChange.seq)
+        .limit(limit)
+    )
+    result = await session.exec(stmt)
+    entries = result.all()
+    if not entries:
+        return BookingChanges(changes=[], next_since=since, has_more=False, reset=False)
+
+    # Several changes to one booking collapse into its current state
+    booking_ids = list(dict.fromkeys(booking_id for _, booking_id in entries))
+    stmt_bookings = (
+        select(Booking, Service, Barber)
+        .join(Service, Service.id == Booking.service_id)
+        .join(Barber, Barber.id == Booking.barber_id)
+        .where(Booking.id.in_(booking_ids))
+        .order_by(Booking.id)
+    )
+    result_bookings = await session.exec(stmt_bookings)
+    changes = [
+        BookingRead(
+            id=booking.id,
+            customer_name=booking.customer_name,
+            customer_email=booking.customer_email,
+            customer_phone=booking.customer_phone,
+            service_id=service.id,
+            service_name=service.name,
+            service_duration=service.duration,
+            service_price=service.price,
+            barber_id=barber.id,
+            barber_name=barber.name,
+            booking_date=booking.booking_date,
+            booking_time=booking.booking_time,
+            status=booking.status,
+            created_at=booking.created_at,
+            updated_at=booking.updated_at
+        )
+        for booking, service, barber in result_bookings.all()
+    ]
+
+    return BookingChanges(
+        changes=changes,
+        next_since=entries[-1][0],
+        has_more=len(entries) == limit,
+        reset=False,
+    )
 
 @router.get("/{booking_id}", response_model=BookingRead)
-async def get_booking(booking_id: int, session: AsyncSession = Depends(get_session)):
-    """Get a specific booking by ID"""
+async def get_booking(booking_id: int, fields: Optional[str] = None, session: AsyncSession = Depends(get_session)):
+    """Get a specific booking by ID, optionally only the given comma-separated fields"""
+    names = parse_fields(fields)
+    if names is not None:
+        result = await session.execute(sparse_booking_select(names).where(Booking.id == booking_id))
+        row = result.mappings().one_or_none()
+        if not row:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        return JSONResponse(jsonable_encoder(row))
+
     stmt = select(Booking).where(Booking.id == booking_id)
     result = await session.exec(stmt)
     booking = result.one_or_none()
@@ -238,22 +400,45 @@ async def get_booking(booking_id: int, session: AsyncSession = Depends(get_sessi
     )
 
 @router.put("/{booking_id}", response_model=BookingRead)
-async def update_booking(booking_id: int, payload: BookingUpdate, session: AsyncSession = Depends(get_session)):
+async def update_booking(
+    booking_id: int,
+    payload: BookingUpdate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    session: AsyncSession = Depends(get_session)
+):
     """Update a booking (change status, date, or time)"""
+    return await idempotency_store.run(
+        session,
+        idempotency_scope(request, "update_booking", idempotency_key),
+        request_fingerprint(booking_id, payload.model_dump(exclude_unset=True)),
+        lambda: apply_booking_update(booking_id, payload, session),
+        response,
+    )
+
+async def apply_booking_update(booking_id: int, payload: BookingUpdate, session: AsyncSession) -> BookingRead:
+    """Apply the provided fields to an existing booking; the idempotency runner commits"""
     stmt = select(Booking).where(Booking.id == booking_id)
     result = await session.exec(stmt)
     booking = result.one_or_none()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
+    # The booking may move, so both the old and the new day change
+    scopes = {(booking.booking_date, booking.barber_id)}
+
     # Update only provided fields
     for key, value in payload.model_dump(exclude_unset=True).items():
         setattr(booking, key, value)
 
     booking.updated_at = datetime.utcnow()
     session.add(booking)
-    await session.commit()
-    await session.refresh(booking)
+    record_change(session, booking.id, "update")
+    scopes.add((booking.booking_date, booking.barber_id))
+    for scope in scopes:
+        await publish(session, AVAILABILITY, scope=scope)
+    await session.flush()
 
     # Get service and barber for response
     stmt_service = select(Service).where(Service.id == booking.service_id)
@@ -294,5 +479,7 @@ async def cancel_booking(booking_id: int, session: AsyncSession = Depends(get_se
     booking.status = "cancelled"
     booking.updated_at = datetime.utcnow()
     session.add(booking)
+    record_change(session, booking.id, "cancel")
+    await publish(session, AVAILABILITY, scope=(booking.booking_date, booking.barber_id))
     await session.commit()
     return {"status": "cancelled"}
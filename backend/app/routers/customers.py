@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, List, Optional, Tuple
+from app.schemas.schemas import CustomerBooking, CustomerMatch
+from app.database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+import math
+import re
+
+router = APIRouter()
+
+# FTS candidates ranked before grouping, keeps common prefixes cheap on large tables
+MAX_CANDIDATES = 500
+
+# Rows read from the trigram index, in index order, before any ranking
+MAX_FUZZY_CANDIDATES = 200
+# Share of the query's trigrams a fuzzy match must contain
+MIN_TRIGRAM_SIMILARITY = 0.5
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 32
+
+PREFIX_MATCHES = """
+matches AS (
+    SELECT rowid AS id, rank FROM booking_fts
+    WHERE booking_fts MATCH :match
+    ORDER BY rank
+    LIMIT :candidates
+)"""
+
+# No ORDER BY rank here: FTS5 stops after :candidates rows instead of scoring
+# every row sharing a trigram. The similarity check then runs on those rows only.
+FUZZY_MATCHES = """
+candidates AS (
+    SELECT rowid AS id, rank FROM booking_trigram
+    WHERE booking_trigram MATCH :match
+    LIMIT :candidates
+),
+matches AS (
+    SELECT c.id, c.rank
+    FROM candidates c JOIN booking b ON b.id = c.id
+    WHERE {score} >= :min_matched
+)"""
+
+# One round trip: best FTS matches -> distinct customers -> their latest bookings
+SEARCH_TEMPLATE = """
+WITH {matches},
+customers AS (
+    SELECT b.customer_name, b.customer_email, b.customer_phone, MIN(m.rank) AS best_rank
+    FROM matches m JOIN booking b ON b.id = m.id
+    GROUP BY b.customer_name, b.customer_email, b.customer_phone
+    ORDER BY best_rank
+    LIMIT :limit
+),
+history AS (
+    SELECT c.customer_name, c.customer_email, c.customer_phone, c.best_rank,
+           b.id, b.booking_date, b.booking_time, b.status,
+           s.name AS service_name, br.name AS barber_name,
+           COUNT(*) OVER (PARTITION BY c.customer_name, c.customer_email, c.customer_phone) AS booking_count,
+           ROW_NUMBER() OVER (
+               PARTITION BY c.customer_name, c.customer_email, c.customer_phone
+               ORDER BY b.booking_date DESC, b.booking_time DESC
+           ) AS position
+    FROM customers c
+    JOIN booking b ON b.customer_name = c.customer_name
+        AND b.customer_email IS c.customer_email
+        AND b.customer_phone IS c.customer_phone
+    JOIN service s ON s.id = b.service_id
+    JOIN barber br ON br.id = b.barber_id
+)
+SELECT * FROM history
+WHERE position <= :recent
+ORDER BY best_rank, customer_name, position
+"""
+SEARCH_SQL = text(SEARCH_TEMPLATE.format(matches=PREFIX_MATCHES))
+
+
+def build_match_query(q: str) -> str:
+    """Turn free text into an FTS5 prefix query, e.g. 'joao sil' -> '"joao"* "sil"*'"""
+    terms = re.findall(r"\w+", q.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def wants_fuzzy(q: str) -> bool:
+    """Phones and emails are exact lookups the prefix index already covers"""
+    return "@" not in q and re.search(r"[^\W\d_]", q) is not None
+
+
+def term_trigrams(q: str) -> List[List[str]]:
+    """Trigrams of each query term; terms shorter than 3 characters are dropped"""
+    terms = [term[:MAX_TERM_LENGTH] for term in re.findall(r"\w+", q.lower()) if len(term) >= 3]
+    return [[term[i:i + 3] for i in range(len(term) - 2)] for term in terms]
+
+
+def build_fuzzy_search(q: str) -> Tuple[Optional[TextClause], dict]:
+    """Trigram query where every term shares a trigram and the row holds enough of them.
+
+    'joao slva' -> MATCH '("joa" OR "oao") AND ("slv" OR "lva")', then at least
+    half of joa, oao, slv, lva must occur in the name, email or phone.
+    """
+    terms = term_trigrams(q)[:MAX_QUERY_TERMS]
+    grams = list(dict.fromkeys(gram for term in terms for gram in term))
+    if not grams:
+        return None, {}
+    match = " AND ".join("(" + " OR ".join(f'"{gram}"' for gram in term) + ")" for term in terms)
+    haystack = "lower(b.customer_name || ' ' || coalesce(b.customer_email, '') || ' ' || coalesce(b.customer_phone, ''))"
+    score = " + ".join(f"(instr({haystack}, :gram{i}) > 0)" for i in range(len(grams)))
+    params = {f"gram{i}": gram for i, gram in enumerate(grams)}
+    params.update(match=match, min_matched=math.ceil(len(grams) * MIN_TRIGRAM_SIMILARITY))
+    sql = text(SEARCH_TEMPLATE.format(matches=FUZZY_MATCHES.format(score=f"({score})")))
+    return sql, params
+
+
+def collect_customers(result) -> Dict[Tuple, CustomerMatch]:
+    customers = {}
+    for row in result.mappings():
+        key = (row["customer_name"], row["customer_email"], row["customer_phone"])
+        if key not in customers:
+            customers[key] = CustomerMatch(
+                customer_name=row["customer_name"],
+                customer_email=row["customer_email"],
+                customer_phone=row["customer_phone"],
+                booking_count=row["booking_count"],
+                recent_bookings=[],
+            )
+        customers[key].recent_bookings.append(CustomerBooking(
+            id=row["id"],
+            service_name=row["service_name"],
+            barber_name=row["barber_name"],
+            booking_date=row["booking_date"],
+            booking_time=row["booking_time"],
+            status=row["status"],
+        ))
+    return customers
+
+
+@router.get("/search", response_model=List[CustomerMatch])
+async def search_customers(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(10, ge=1, le=50),
+    recent: int = Query(5, ge=1, le=20),
+    session: AsyncSession = Depends(get_session)
+):
+    """Search customers by name, email or phone prefix, with their most recent bookings.
+
+    Only when the prefix index finds nobody, name searches fall back to the
+    trigram index, which tolerates typos and infix queries.
+    """
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    params = {"candidates": MAX_CANDIDATES, "limit": limit, "recent": recent}
+    result = await session.execute(SEARCH_SQL, {**params, "match": match})
+    customers = collect_customers(result)
+    if customers or not wants_fuzzy(q):
+        return list(customers.values())
+
+    fuzzy_sql, fuzzy_params = build_fuzzy_search(q)
+    if fuzzy_sql is None:
+        return []
+    result = await session.execute(fuzzy_sql, {**params, **fuzzy_params, "candidates": MAX_FUZZY_CANDIDATES})
+    return list(collect_customers(result).values())
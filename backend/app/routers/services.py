@@ -5,6 +5,7 @@ from app.database import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from app.models.models import Service
+from app.invalidation import cache, publish, MISSING, SERVICES, AVAILABILITY
 from datetime import datetime
 
 router = APIRouter()
@@ -14,6 +15,7 @@ async def create_service(payload: ServiceCreate, session: AsyncSession = Depends
     """Create a new service"""
     service = Service(**payload.model_dump())
     session.add(service)
+    await publish(session, SERVICES)
     await session.commit()
     await session.refresh(service)
     return service
@@ -21,11 +23,18 @@ async def create_service(payload: ServiceCreate, session: AsyncSession = Depends
 @router.get("", response_model=List[ServiceRead])
 async def list_services(active_only: bool = True, session: AsyncSession = Depends(get_session)):
     """List all services, optionally filter by active status"""
+    tenant = session.info.get("tenant")
+    generation = cache.generation(tenant, SERVICES)
+    cached = cache.get(tenant, SERVICES, active_only)
+    if cached is not MISSING:
+        return cached
+
     stmt = select(Service)
     if active_only:
         stmt = stmt.where(Service.active == True)
     result = await session.exec(stmt)
-    services = result.all()
+    services = [ServiceRead.model_validate(service, from_attributes=True) for service in result.all()]
+    cache.set(tenant, SERVICES, active_only, services, generation)
     return services
 
 @router.get("/{service_id}", response_model=ServiceRead)
@@ -52,6 +61,8 @@ async def update_service(service_id: int, payload: ServiceUpdate, session: Async
         setattr(service, key, value)
 
     session.add(service)
+    # A new duration changes which slots are free
+    await publish(session, SERVICES, AVAILABILITY)
     await session.commit()
     await session.refresh(service)
     return service
@@ -67,5 +78,6 @@ async def delete_service(service_id: int, session: AsyncSession = Depends(get_se
 
     service.active = False
     session.add(service)
+    await publish(session, SERVICES)
     await session.commit()
     return {"status": "deleted"}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -85,3 +85,27 @@ class BookingRead(BaseModel):
     status: str
     created_at: datetime
     updated_at: Optional[datetime]
+
+
+class CustomerBooking(BaseModel):
+    id: int
+    service_name: str
+    barber_name: str
+    booking_date: str
+    booking_time: str
+    status: str
+
+
+class CustomerMatch(BaseModel):
+    customer_name: str
+    customer_email: Optional[str]
+    customer_phone: Optional[str]
+    booking_count: int
+    recent_bookings: List[CustomerBooking]
+
+
+class BookingChanges(BaseModel):
+    changes: List[BookingRead]
+    next_since: int
+    has_more: bool
+    reset: bool
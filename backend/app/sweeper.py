@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, literal_column, or_, update
+from sqlmodel import select
+
+from app.database import background_session_factories
+from app.changelog import compact, record_changes
+from app.idempotency import purge_expired
+from app.invalidation import purge_versions
+from app.models.models import Booking
+
+logger = logging.getLogger(__name__)
+
+SWEEP_ENABLED = os.getenv("SWEEP_ENABLED", "1") == "1"
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SWEEP_INTERVAL_SECONDS", "300"))
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", "200"))
+SWEEP_MAX_CHUNKS = int(os.getenv("SWEEP_MAX_CHUNKS", "50"))
+SWEEP_CHUNK_PAUSE_SECONDS = float(os.getenv("SWEEP_CHUNK_PAUSE_SECONDS", "0.05"))
+# Longest service is 1h30min, so a booking is only swept once it is surely over
+SWEEP_GRACE_MINUTES = int(os.getenv("SWEEP_GRACE_MINUTES", "120"))
+SWEEP_PAST_STATUS = os.getenv("SWEEP_PAST_STATUS", "completed")
+
+SWEEPABLE_STATUSES = ("completed", "no_show")
+
+
+def past_cutoff(now: datetime) -> tuple:
+    """Return the (date, time) strings before which a booking is over"""
+    cutoff = now - timedelta(minutes=SWEEP_GRACE_MINUTES)
+    return cutoff.strftime("%Y-%m-%d"), cutoff.strftime("%H:%M")
+
+
+def past_confirmed_stmt(cursor: int, now: datetime):
+    """Next chunk of past confirmed booking ids after the cursor.
+
+    The status is compared to a literal rather than a bound parameter so
+    SQLite can use the partial index ix_booking_confirmed and only walk
+    confirmed rows, not every booking from the cursor on.
+    """
+    cutoff_date, cutoff_time = past_cutoff(now)
+    is_past = or_(
+        Booking.booking_date < cutoff_date,
+        and_(Booking.booking_date == cutoff_date, Booking.booking_time <= cutoff_time),
+    )
+    return (
+        select(Booking.id)
+        .where(Booking.id > cursor, Booking.status == literal_column("'confirmed'"), is_past)
+        .order_by(Booking.id)
+        .limit(SWEEP_CHUNK_SIZE)
+    )
+
+
+class BookingSweeper:
+    """Background task moving past confirmed bookings to a final status.
+
+    Each chunk is a short read of ids followed by one set-based UPDATE in its
+    own transaction, so the SQLite write lock is held only briefly and live
+    booking traffic can interleave between chunks. The id cursor lets a pass
+    that hit SWEEP_MAX_CHUNKS resume on the next tick instead of restarting.
+    In multi-tenant mode every tenant database is swept, each with its own
+    cursor, including shops idle long enough to have left the engine pool.
+    Each pass also compacts one chunk of the booking change log and purges
+    one chunk each of expired idempotency keys and past-date cache versions.
+    """
+
+    def __init__(self, target_status: str = SWEEP_PAST_STATUS):
+        if target_status not in SWEEPABLE_STATUSES:
+            raise ValueError(f"Invalid sweep status: {target_status}")
+        self.target_status = target_status
+        self.cursors: Dict[Optional[str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep_chunk(self, tenant: Optional[str], session_factory, now: datetime) -> List[int]:
+        """Transition the next chunk of past bookings after the tenant's cursor"""
+        cursor = self.cursors.get(tenant, 0)
+
+        async with session_factory() as session:
+            result = await session.exec(past_confirmed_stmt(cursor, now))
+            ids = list(result.all())
+            if not ids:
+                return []
+
+            # Re-check the status so a concurrent update by staff wins
+            await session.execute(
+                update(Booking)
+                .where(Booking.id.in_(ids), Booking.status == "confirmed")
+                .values(status=self.target_status, updated_at=datetime.utcnow())
+            )
+            # A spurious entry for a row staff already changed only makes clients re-read it
+            await record_changes(session, ids, "sweep")
+            await session.commit()
+
+        self.cursors[tenant] = ids[-1]
+        return ids
+
+    async def sweep_tenant(self, tenant: Optional[str], session_factory, now: datetime) -> int:
+        swept = 0
+        for _ in range(SWEEP_MAX_CHUNKS):
+            ids = await self.sweep_chunk(tenant, session_factory, now)
+            if not ids:
+                # Reached the end, start from the beginning on the next pass
+                self.cursors.pop(tenant, None)
+                break
+            swept += len(ids)
+            await asyncio.sleep(SWEEP_CHUNK_PAUSE_SECONDS)
+        return swept
+
+    async def sweep(self) -> int:
+        """Run one bounded pass and return the number of bookings swept"""
+        # Booking dates and times are stored in the shop's local time
+        now = datetime.now()
+        swept = 0
+        async for tenant, session_factory in background_session_factories():
+            swept += await self.sweep_tenant(tenant, session_factory, now)
+            await compact(session_factory)
+            await purge_expired(session_factory)
+            await purge_versions(session_factory)
+        return swept
+
+    async def run(self):
+        while True:
+            try:
+                swept = await self.sweep()
+                if swept:
+                    logger.info("Swept %d past bookings to %s", swept, self.target_status)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Booking sweep failed")
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
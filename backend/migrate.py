@@ -0,0 +1,31 @@
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import init_db, list_tenants, multi_tenant
+
+
+async def run_migrations(tenants):
+    for tenant in tenants:
+        old, new = await init_db(tenant)
+        name = tenant or "banco padrao"
+        if old == new:
+            print(f"{name}: schema ja na versao {new}")
+        else:
+            print(f"{name}: schema migrado da versao {old} para {new}")
+
+
+if __name__ == "__main__":
+    # python migrate.py              -> banco padrao, ou todas as barbearias em modo multi-tenant
+    # python migrate.py acme beta    -> apenas as barbearias indicadas (cria o banco se nao existir)
+    if len(sys.argv) > 1:
+        if not multi_tenant():
+            sys.exit("Barbearia informada, mas TENANT_DATABASE_URL nao esta definido")
+        tenants = sys.argv[1:]
+    elif multi_tenant():
+        tenants = list_tenants()
+    else:
+        tenants = [None]
+    asyncio.run(run_migrations(tenants))
@@ -4,15 +4,16 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.database import get_session, init_db
+from app.database import async_session, init_db, multi_tenant, session_factory_for
 from app.models.models import Service, Barber
 from app.auth import get_password_hash
 from sqlmodel import select
 
-async def seed_data():
-    await init_db()
+async def seed_data(tenant=None):
+    await init_db(tenant)
 
-    async for session in get_session():
+    session_factory = async_session if tenant is None else await session_factory_for(tenant)
+    async with session_factory() as session:
         result = await session.exec(select(Service))
         existing_services = result.all()
 
@@ -98,7 +99,9 @@ async def seed_data():
         print("  Email: barbeiro1@barbearia.com.br")
         print("  Senha: 871374")
 
-        break
-
 if __name__ == "__main__":
-    asyncio.run(seed_data())
+    # python seed_data.py [tenant] -- com tenant, cria e popula o banco da barbearia
+    tenant = sys.argv[1] if len(sys.argv) > 1 else None
+    if tenant is not None and not multi_tenant():
+        sys.exit("Barbearia informada, mas TENANT_DATABASE_URL nao esta definido")
+    asyncio.run(seed_data(tenant))
@@ -0,0 +1,66 @@
+import os
+
+# Configure the app before it is imported: settings are read at import time.
+# The real database file is set up per session below, under pytest's tmp dir.
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
+os.environ["TENANT_DATABASE_URL"] = ""
+os.environ["ADMISSION_ENABLED"] = "0"
+os.environ["SWEEP_ENABLED"] = "0"
+
+import httpx
+import pytest
+from asgi_lifespan import LifespanManager
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import database
+from app.idempotency import idempotency_store
+from app.invalidation import cache
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def db_path(tmp_path_factory):
+    """Point the app's default engine at a file in pytest's temp dir"""
+    path = str(tmp_path_factory.mktemp("db") / "test.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", echo=False, future=True)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database, "engine", engine)
+        patch.setattr(database, "async_session", sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        yield path
+
+
+@pytest.fixture
+async def db(db_path):
+    """A freshly migrated SQLite file per test"""
+    await database.engine.dispose()
+    for suffix in ("", "-journal"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    await database.init_db()
+    idempotency_store.completed.clear()
+    cache.namespaces.clear()
+    cache.generations.clear()
+    yield db_path
+    await database.engine.dispose()
+
+
+@pytest.fixture
+async def client(db):
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+
+@pytest.fixture
+async def shop(client):
+    """One service and one barber, returned as (service_id, barber_id)"""
+    response = await client.post("/api/services", json={"name": "Corte", "duration": "30min", "price": "R$ 25"})
+    service_id = response.json()["id"]
+    response = await client.post(
+        "/auth/register", json={"name": "Barbeiro", "email": "barbeiro@teste.com", "password": "senha"}
+    )
+    barber_id = response.json()["barber_id"]
+    return service_id, barber_id
+
@@ -0,0 +1,14 @@
+def booking_payload(shop, **overrides):
+    """Valid create-booking body for the shop fixture's service and barber"""
+    service_id, barber_id = shop
+    payload = {
+        "customer_name": "Joao Silva",
+        "customer_email": "joao@email.com",
+        "customer_phone": "(11) 98765-4321",
+        "service_id": service_id,
+        "barber_id": barber_id,
+        "booking_date": "2031-01-10",
+        "booking_time": "10:00",
+    }
+    payload.update(overrides)
+    return payload
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.admission import AdmissionMiddleware, RouteLimit
+
+
+class SlowApp:
+    """Answers 200, holding each request until release is set"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, scope, receive, send):
+        await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+def admission(**booking):
+    limits = {
+        "login": RouteLimit(rate=1.0, burst=5, max_concurrency=4, max_wait=1.0),
+        "booking": RouteLimit(**{"rate": 0.5, "burst": 2, "max_concurrency": 4, "max_wait": 1.0, **booking}),
+        "read": RouteLimit(rate=20.0, burst=100, max_concurrency=64, max_wait=1.0),
+    }
+    inner = SlowApp()
+    middleware = AdmissionMiddleware(inner, limits)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+    return inner, middleware, client
+
+
+async def test_empty_bucket_gets_429_with_retry_after():
+    _, _, client = admission()
+    async with client:
+        statuses = [(await client.post("/api/bookings")).status_code for _ in range(2)]
+        rejected = await client.post("/api/bookings")
+
+    assert statuses == [200, 200]
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "2"
+
+
+async def test_reads_have_their_own_budget():
+    _, _, client = admission()
+    async with client:
+        for _ in range(3):
+            await client.post("/api/bookings")
+        response = await client.get("/api/services")
+
+    assert response.status_code == 200
+
+
+async def test_full_queue_is_shed_with_503_and_the_token_refunded():
+    inner, middleware, client = admission(burst=10, max_concurrency=1, max_wait=5.0)
+    inner.release.clear()
+    async with client:
+        running = asyncio.create_task(client.post("/api/bookings"))
+        queued = asyncio.create_task(client.post("/api/bookings"))
+        await asyncio.sleep(0.05)
+
+        shed = await client.post("/api/bookings")
+        bucket = middleware.buckets[("booking", "127.0.0.1")]
+        assert bucket.tokens == pytest.approx(8, abs=0.1)
+
+        inner.release.set()
+        assert [r.status_code for r in await asyncio.gather(running, queued)] == [200, 200]
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "5"
+
+
+async def test_wait_past_max_wait_gets_503():
+    inner, _, client = admission(max_concurrency=1, max_wait=0.05)
+    inner.release.clear()
+    async with client:
+        running = asyncio.create_task(client.post("/api/bookings"))
+        await asyncio.sleep(0.01)
+        timed_out = await client.post("/api/bookings")
+        inner.release.set()
+        await running
+
+    assert timed_out.status_code == 503
+    assert timed_out.headers["Retry-After"] == "1"
@@ -0,0 +1,62 @@
+from app import changelog, database
+from app.changelog import compact
+from tests.helpers import booking_payload
+
+
+async def create_bookings(client, shop, count):
+    ids = []
+    for hour in range(10, 10 + count):
+        response = await client.post("/api/bookings", json=booking_payload(shop, booking_time=f"{hour}:00"))
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def changes(client, **params):
+    response = await client.get("/api/bookings/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_paging_with_next_since(client, shop):
+    ids = await create_bookings(client, shop, 3)
+
+    page = await changes(client, since=0, limit=2)
+    assert [b["id"] for b in page["changes"]] == ids[:2]
+    assert page["has_more"] is True
+
+    page = await changes(client, since=page["next_since"], limit=2)
+    assert [b["id"] for b in page["changes"]] == ids[2:]
+    assert page["has_more"] is False
+
+    last = await changes(client, since=page["next_since"], limit=2)
+    assert last == {"changes": [], "next_since": page["next_since"], "has_more": False, "reset": False}
+
+
+async def test_changes_are_ordered_by_booking(client, shop):
+    ids = await create_bookings(client, shop, 2)
+    since = (await changes(client))["next_since"]
+
+    await client.put(f"/api/bookings/{ids[1]}", json={"booking_time": "14:00"})
+    await client.put(f"/api/bookings/{ids[0]}", json={"booking_time": "15:00"})
+
+    page = await changes(client, since=since)
+    assert [b["id"] for b in page["changes"]] == ids
+
+
+async def test_compaction_keeps_newest_and_resets_stale_clients(client, shop, monkeypatch):
+    ids = await create_bookings(client, shop, 3)
+    newest = (await changes(client))["next_since"]
+
+    monkeypatch.setattr(changelog, "CHANGELOG_RETENTION_DAYS", -1)
+    assert await compact(database.async_session) == 2
+    assert await compact(database.async_session) == 0
+
+    async with database.async_session() as session:
+        assert await changelog.oldest_seq(session) == newest
+
+    stale = await changes(client, since=0)
+    assert stale == {"changes": [], "next_since": newest, "has_more": False, "reset": True}
+
+    current = await changes(client, since=newest - 1)
+    assert current["reset"] is False
+    assert [b["id"] for b in current["changes"]] == ids[2:]
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import event
+
+from app import database
+from tests.helpers import booking_payload
+
+
+async def create_customers(client, shop):
+    await client.post("/api/bookings", json=booking_payload(shop))
+    await client.post("/api/bookings", json=booking_payload(
+        shop, customer_name="Maria Souza", customer_email="maria@email.com",
+        customer_phone="(21) 91234-0000", booking_time="11:00",
+    ))
+
+
+async def search(client, q):
+    response = await client.get("/api/customers/search", params={"q": q})
+    assert response.status_code == 200
+    return [customer["customer_name"] for customer in response.json()]
+
+
+@pytest.fixture
+def trigram_queries():
+    """Count the statements that touch the trigram index"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "booking_trigram MATCH" in statement:
+            statements.append(statement)
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(database.engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_prefix_search(client, shop):
+    await create_customers(client, shop)
+    assert await search(client, "joao sil") == ["Joao Silva"]
+    assert await search(client, "maria@") == ["Maria Souza"]
+    assert await search(client, "2191234") == ["Maria Souza"]
+
+
+async def test_exact_hits_do_not_run_the_trigram_query(client, shop, trigram_queries):
+    await create_customers(client, shop)
+    assert await search(client, "Joao Silva") == ["Joao Silva"]
+    assert await search(client, "(11) 98765-4321") == ["Joao Silva"]
+    # Phones and emails never fall back, even without a hit
+    assert await search(client, "11 900001234") == []
+    assert await search(client, "nobody@email.com") == []
+    assert trigram_queries == []
+
+
+async def test_fuzzy_search_tolerates_typos_and_infixes(client, shop, trigram_queries):
+    await create_customers(client, shop)
+    assert await search(client, "Joao Slva") == ["Joao Silva"]
+    assert await search(client, "ilva") == ["Joao Silva"]
+    assert len(trigram_queries) == 2
+
+
+async def test_fuzzy_search_rejects_weak_matches(client, shop):
+    await create_customers(client, shop)
+    assert await search(client, "xyzw") == []
+    # Shares only "sou" with Souza
+    assert await search(client, "soufflé") == []
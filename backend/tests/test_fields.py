@@ -0,0 +1,64 @@
+import pytest
+
+from app.main import GZIP_MINIMUM_SIZE
+from tests.helpers import booking_payload
+
+FIELDS = "id,booking_time,barber_name,status"
+
+
+async def test_list_returns_only_requested_fields(client, shop):
+    await client.post("/api/bookings", json=booking_payload(shop))
+
+    response = await client.get("/api/bookings", params={"fields": FIELDS})
+
+    assert response.status_code == 200
+    assert [set(booking) for booking in response.json()] == [set(FIELDS.split(","))]
+    assert response.json()[0]["barber_name"] == "Barbeiro"
+
+
+async def test_get_returns_only_requested_fields(client, shop):
+    booking = (await client.post("/api/bookings", json=booking_payload(shop))).json()
+
+    response = await client.get(f"/api/bookings/{booking['id']}", params={"fields": "service_name,booking_date"})
+
+    assert response.json() == {"service_name": "Corte", "booking_date": booking["booking_date"]}
+    missing = await client.get("/api/bookings/999", params={"fields": "id"})
+    assert missing.status_code == 404
+
+
+@pytest.mark.parametrize("fields", ["", " , ", "id,password_hash"])
+async def test_invalid_fields_are_400(client, shop, fields):
+    booking = (await client.post("/api/bookings", json=booking_payload(shop))).json()
+
+    listed = await client.get("/api/bookings", params={"fields": fields})
+    single = await client.get(f"/api/bookings/{booking['id']}", params={"fields": fields})
+
+    assert listed.status_code == 400
+    assert single.status_code == 400
+
+
+async def test_filters_apply_with_sparse_fields(client, shop):
+    await client.post("/api/bookings", json=booking_payload(shop, booking_date="2031-01-10"))
+    other = await client.post("/api/bookings", json=booking_payload(
+        shop, booking_date="2031-01-11", customer_name="Maria Souza",
+    ))
+
+    by_date = await client.get("/api/bookings", params={"date": "2031-01-11", "fields": "id"})
+    by_customer = await client.get("/api/bookings", params={"customer_name": "Maria Souza", "fields": "id"})
+
+    assert by_date.json() == [{"id": other.json()["id"]}]
+    assert by_customer.json() == [{"id": other.json()["id"]}]
+
+
+async def test_large_responses_are_gzipped(client, shop):
+    for hour in range(9, 18):
+        await client.post("/api/bookings", json=booking_payload(shop, booking_time=f"{hour:02d}:00"))
+    headers = {"Accept-Encoding": "gzip"}
+
+    large = await client.get("/api/bookings", headers=headers)
+    small = await client.get("/api/bookings", params={"fields": "id", "date": "1999-01-01"}, headers=headers)
+
+    assert len(large.content) > GZIP_MINIMUM_SIZE
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert len(large.json()) == 9
+    assert "Content-Encoding" not in small.headers
@@ -0,0 +1,126 @@
+import asyncio
+import sqlite3
+
+from fastapi import Response
+
+from app import database, idempotency
+from app.idempotency import IdempotencyStore, Outcome, idempotency_store, purge_expired, request_fingerprint
+from app.routers.bookings import save_new_booking
+from app.schemas.schemas import BookingCreate
+from tests.helpers import booking_payload
+
+KEY = {"Idempotency-Key": "f3b1c2d4"}
+
+
+def stored_keys(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT state, status_code FROM idempotencykey").fetchall()
+
+
+async def test_concurrent_posts_with_one_key_create_one_booking(client, shop, db):
+    payload = booking_payload(shop)
+    responses = await asyncio.gather(
+        *[client.post("/api/bookings", json=payload, headers=KEY) for _ in range(5)]
+    )
+
+    assert [r.status_code for r in responses] == [201] * 5
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 4
+    assert len((await client.get("/api/bookings")).json()) == 1
+    assert stored_keys(db) == [("completed", None)]
+
+
+async def test_key_reused_with_different_body_is_rejected(client, shop):
+    await client.post("/api/bookings", json=booking_payload(shop), headers=KEY)
+
+    response = await client.post("/api/bookings", json=booking_payload(shop, booking_time="11:00"), headers=KEY)
+    assert response.status_code == 422
+
+    # Also when only the database knows the key
+    idempotency_store.completed.clear()
+    response = await client.post("/api/bookings", json=booking_payload(shop, booking_time="11:00"), headers=KEY)
+    assert response.status_code == 422
+
+
+async def test_replay_from_database_without_memory(client, shop):
+    first = await client.post("/api/bookings", json=booking_payload(shop), headers=KEY)
+    idempotency_store.completed.clear()
+
+    replay = await client.post("/api/bookings", json=booking_payload(shop), headers=KEY)
+
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert len((await client.get("/api/bookings")).json()) == 1
+
+
+async def test_workers_racing_on_one_key_create_one_booking(shop):
+    payload = BookingCreate(**booking_payload(shop))
+    key = ("", "create_booking", "f3b1c2d4")
+
+    async def worker():
+        # Separate stores and sessions, as in two processes
+        async with database.async_session() as session:
+            response = Response()
+            value = await IdempotencyStore().run(
+                session, key, request_fingerprint(payload), lambda: save_new_booking(payload, session), response
+            )
+            return value, response.headers.get("Idempotent-Replayed")
+
+    results = await asyncio.gather(worker(), worker())
+
+    ids = {value.id if hasattr(value, "id") else value["id"] for value, _ in results}
+    assert len(ids) == 1
+    assert sorted(str(replayed) for _, replayed in results) == ["None", "true"]
+
+
+async def test_http_errors_are_replayed(client, shop, db):
+    missing = booking_payload(shop, service_id=999)
+    first = await client.post("/api/bookings", json=missing, headers=KEY)
+    assert first.status_code == 404
+    assert stored_keys(db) == [("completed", 404)]
+
+    idempotency_store.completed.clear()
+    replay = await client.post("/api/bookings", json=missing, headers=KEY)
+    assert replay.status_code == 404
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+async def test_unexpected_error_releases_the_key(client, shop, db, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("app.routers.bookings.save_new_booking", broken)
+    try:
+        await client.post("/api/bookings", json=booking_payload(shop), headers=KEY)
+    except RuntimeError:
+        pass
+    assert stored_keys(db) == []
+
+    monkeypatch.undo()
+    response = await client.post("/api/bookings", json=booking_payload(shop), headers=KEY)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+async def test_expired_keys_are_purged_in_chunks(client, shop, db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_TTL_SECONDS", -1)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PURGE_CHUNK_SIZE", 1)
+    for time, key in (("10:00", "a"), ("11:00", "b")):
+        await client.post("/api/bookings", json=booking_payload(shop, booking_time=time), headers={"Idempotency-Key": key})
+
+    assert await purge_expired(database.async_session) == 1
+    assert await purge_expired(database.async_session) == 1
+    assert await purge_expired(database.async_session) == 0
+    assert stored_keys(db) == []
+
+
+def test_memory_store_evicts_expired_and_least_recent():
+    store = IdempotencyStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.completed[key] = Outcome("fingerprint", value=key)
+    store.purge()
+    assert list(store.completed) == ["b", "c"]
+
+    store.completed["b"].expires_at = 0
+    store.purge()
+    assert list(store.completed) == ["c"]
@@ -0,0 +1,85 @@
+import sqlite3
+
+from app import database
+from app.invalidation import AVAILABILITY, MISSING, InvalidationPoller, LocalCache, cache, purge_versions
+from tests.helpers import booking_payload
+
+DAY = "2031-01-10"
+OTHER_DAY = "2031-01-11"
+
+
+async def available_times(client, shop, date):
+    service_id, barber_id = shop
+    response = await client.get(
+        "/api/bookings/available-times", params={"barber_id": barber_id, "date": date, "service_id": service_id}
+    )
+    assert response.status_code == 200
+    return response.json()["available_times"]
+
+
+def cached(shop, date):
+    service_id, barber_id = shop
+    return cache.get(None, AVAILABILITY, (date, barber_id, service_id))
+
+
+def test_set_is_skipped_after_a_concurrent_invalidation():
+    local = LocalCache()
+    generation = local.generation(None, AVAILABILITY)
+    # A write commits while the read is still querying
+    local.invalidate(None, AVAILABILITY, (DAY, 1))
+    local.set(None, AVAILABILITY, (DAY, 1, 1), ["10:00"], generation)
+    assert local.get(None, AVAILABILITY, (DAY, 1, 1)) is MISSING
+
+    local.set(None, AVAILABILITY, (DAY, 1, 1), ["10:00"], local.generation(None, AVAILABILITY))
+    assert local.get(None, AVAILABILITY, (DAY, 1, 1)) == ["10:00"]
+
+
+async def test_booking_invalidates_only_its_day(client, shop):
+    assert "10:00" in await available_times(client, shop, DAY)
+    await available_times(client, shop, OTHER_DAY)
+
+    await client.post("/api/bookings", json=booking_payload(shop, booking_date=DAY))
+
+    assert cached(shop, DAY) is MISSING
+    assert cached(shop, OTHER_DAY) is not MISSING
+    assert "10:00" not in await available_times(client, shop, DAY)
+
+
+async def test_moving_a_booking_invalidates_both_days(client, shop):
+    booking = await client.post("/api/bookings", json=booking_payload(shop, booking_date=DAY))
+    await available_times(client, shop, DAY)
+    await available_times(client, shop, OTHER_DAY)
+
+    await client.put(f"/api/bookings/{booking.json()['id']}", json={"booking_date": OTHER_DAY})
+
+    assert "10:00" in await available_times(client, shop, DAY)
+    assert "10:00" not in await available_times(client, shop, OTHER_DAY)
+
+
+async def test_poller_applies_other_workers_writes(client, shop, db):
+    poller = InvalidationPoller()
+    await poller.poll()
+    await available_times(client, shop, DAY)
+    await available_times(client, shop, OTHER_DAY)
+
+    # Another worker books DAY: only the version row changes here
+    _, barber_id = shop
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "INSERT INTO cacheversion (name, version) VALUES (?, (SELECT max(version) + 1 FROM cacheversion))",
+            (f"availability:{DAY}:{barber_id}",),
+        )
+    await poller.poll()
+
+    assert cached(shop, DAY) is MISSING
+    assert cached(shop, OTHER_DAY) is not MISSING
+
+
+async def test_past_day_versions_are_purged(client, shop, db):
+    await client.post("/api/bookings", json=booking_payload(shop, booking_date="2020-01-01"))
+    await client.post("/api/bookings", json=booking_payload(shop, booking_date=DAY))
+
+    assert await purge_versions(database.async_session) == 1
+    with sqlite3.connect(db) as conn:
+        names = [name for name, in conn.execute("SELECT name FROM cacheversion WHERE name LIKE 'availability:%'")]
+    assert names == [f"availability:{DAY}:{shop[1]}"]
@@ -0,0 +1,24 @@
+import logging
+
+from fastapi import FastAPI
+
+from app import main
+
+
+async def test_startup_report_counts_only_startup_phases(client):
+    report = main.app.state.startup_report
+    assert report["total_ms"] == round(report["imports_ms"] + report["app_ms"] + report["db_ms"], 1)
+    assert report["wait_ms"] >= 0
+
+
+def test_time_before_lifespan_is_not_startup(caplog, monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_TARGET_MS", 60 * 1000)
+    app = FastAPI()
+    # A worker forked from a preloaded app an hour after the import
+    with caplog.at_level(logging.INFO, logger="app.main"):
+        main.report_startup(app, main.APP_BUILT_AT + 3600, db_ms=5.0)
+
+    assert app.state.startup_report["wait_ms"] == 3600 * 1000
+    report = app.state.startup_report
+    assert report["total_ms"] == round(report["imports_ms"] + report["app_ms"] + 5.0, 1)
+    assert all(record.levelno == logging.INFO for record in caplog.records)
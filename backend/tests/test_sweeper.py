@@ -0,0 +1,50 @@
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy.dialects import sqlite
+
+from app import sweeper
+from app.sweeper import BookingSweeper, past_confirmed_stmt
+from tests.helpers import booking_payload
+
+
+def test_sweep_query_uses_partial_index(db):
+    stmt = past_confirmed_stmt(0, datetime(2030, 1, 1, 12, 0))
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with sqlite3.connect(db) as conn:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+    assert "ix_booking_confirmed" in plan
+
+
+async def test_sweep_moves_only_past_confirmed_bookings(client, shop):
+    past = await client.post("/api/bookings", json=booking_payload(shop, booking_date="2020-01-01"))
+    cancelled = await client.post("/api/bookings", json=booking_payload(shop, booking_date="2020-01-02"))
+    future = await client.post("/api/bookings", json=booking_payload(shop, booking_date="2999-01-01"))
+    await client.delete(f"/api/bookings/{cancelled.json()['id']}")
+
+    swept = await BookingSweeper().sweep()
+
+    assert swept == 1
+    statuses = {b["id"]: b["status"] for b in (await client.get("/api/bookings")).json()}
+    assert statuses[past.json()["id"]] == "completed"
+    assert statuses[cancelled.json()["id"]] == "cancelled"
+    assert statuses[future.json()["id"]] == "confirmed"
+
+
+async def test_sweep_resumes_from_cursor(client, shop, monkeypatch):
+    monkeypatch.setattr(sweeper, "SWEEP_CHUNK_SIZE", 1)
+    monkeypatch.setattr(sweeper, "SWEEP_MAX_CHUNKS", 1)
+    monkeypatch.setattr(sweeper, "SWEEP_CHUNK_PAUSE_SECONDS", 0)
+    ids = []
+    for day in ("01", "02", "03"):
+        response = await client.post("/api/bookings", json=booking_payload(shop, booking_date=f"2020-01-{day}"))
+        ids.append(response.json()["id"])
+
+    sweeper_task = BookingSweeper(target_status="no_show")
+    assert await sweeper_task.sweep() == 1
+    assert sweeper_task.cursors[None] == ids[0]
+    assert await sweeper_task.sweep() == 1
+    assert sweeper_task.cursors[None] == ids[1]
+
+    statuses = [b["status"] for b in (await client.get("/api/bookings")).json()]
+    assert statuses == ["no_show", "no_show", "confirmed"]
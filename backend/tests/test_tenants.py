@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app import database
+from app.database import TenantEnginePool, init_db
+from app.sweeper import BookingSweeper
+
+
+@pytest.fixture
+async def tenants(tmp_path, monkeypatch):
+    """Multi-tenant mode with two migrated shops, acme and beta"""
+    monkeypatch.setattr(database, "TENANT_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path}/{{tenant}}.db")
+    pool = TenantEnginePool(max_size=2, idle_seconds=60)
+    monkeypatch.setattr(database, "tenant_pool", pool)
+    for tenant in ("acme", "beta", "gamma"):
+        await init_db(tenant)
+    yield pool
+    await pool.dispose_all()
+
+
+async def test_pool_evicts_least_recently_used_at_max_size(tenants):
+    await tenants.get("acme")
+    await tenants.get("beta")
+    await tenants.get("acme")
+    await tenants.get("gamma")
+
+    assert list(tenants.entries) == ["acme", "gamma"]
+
+
+async def test_pool_evicts_idle_engines(tenants):
+    await tenants.get("acme")
+    tenants.entries["acme"].last_used = time.monotonic() - 120
+
+    await tenants.get("beta")
+
+    assert list(tenants.entries) == ["beta"]
+
+
+async def test_unknown_tenant_is_404(client, tenants):
+    response = await client.get("/api/services", headers={"X-Tenant": "nope"})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("tenant", ["../acme", "ACME!", "-acme"])
+async def test_invalid_tenant_is_400(client, tenants, tenant):
+    response = await client.get("/api/services", headers={"X-Tenant": tenant})
+    assert response.status_code == 400
+
+
+async def test_missing_tenant_is_400(client, tenants):
+    response = await client.get("/api/services")
+    assert response.status_code == 400
+
+
+async def test_tenants_do_not_see_each_other(client, tenants):
+    service = {"name": "Corte", "duration": "30min", "price": "R$ 25"}
+    response = await client.post("/api/services", json=service, headers={"X-Tenant": "acme"})
+    assert response.status_code == 201
+
+    acme = await client.get("/api/services", headers={"X-Tenant": "acme"})
+    beta = await client.get("/api/services", headers={"X-Tenant": "beta"})
+    assert [s["name"] for s in acme.json()] == ["Corte"]
+    assert beta.json() == []
+
+
+async def test_sweeper_visits_tenants_outside_the_pool(tenants, tmp_path):
+    with sqlite3.connect(tmp_path / "gamma.db") as conn:
+        conn.execute(
+            "INSERT INTO booking (customer_name, service_id, barber_id, booking_date, booking_time, status, created_at) "
+            "VALUES ('Joao', 1, 1, '2020-01-01', '10:00', 'confirmed', '2020-01-01 09:00:00')"
+        )
+    # A shop file that was never migrated is skipped, not an error
+    sqlite3.connect(tmp_path / "delta.db").close()
+
+    assert await BookingSweeper().sweep() == 1
+
+    with sqlite3.connect(tmp_path / "gamma.db") as conn:
+        assert conn.execute("SELECT status FROM booking").fetchall() == [("completed",)]
+    assert list(tenants.entries) == []
+
+
+@pytest.mark.parametrize("script", ["migrate.py", "seed_data.py"])
+def test_scripts_reject_tenant_outside_multi_tenant_mode(script):
+    result = subprocess.run(
+        [sys.executable, script, "acme"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        env={"TENANT_DATABASE_URL": "", "PATH": ""},
+    )
+    assert result.returncode == 1
+    assert "TENANT_DATABASE_URL" in result.stderr